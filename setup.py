@@ -31,7 +31,6 @@ setup(
     install_requires=[
         "argcomplete >= 1.8.2",
         "colorama >= 0.3.7",
-        "crcmod >= 1.7",
         "pycryptodome >= 3.15.0",
         "pyserial >= 3.0.1",
         "toml >= 0.10.2",
@@ -4,6 +4,24 @@ import textwrap
 
 from .exceptions import TockLoaderException
 
+# The crt0 header some apps place at the start of the application binary.
+_CRT0_STRUCT = struct.Struct("<10I")
+# Template for `TabApp.get_crt0_header_str()`. Argument 10 is the number of
+# relocations, which is not part of the crt0 header itself.
+_CRT0_TEMPLATE = (
+    "got_sym_start       : {0:>10} {0:>#12x}\n"
+    "got_start           : {1:>10} {1:>#12x}\n"
+    "got_size            : {2:>10} {2:>#12x}\n"
+    "data_sym_start      : {3:>10} {3:>#12x}\n"
+    "data_start          : {4:>10} {4:>#12x}\n"
+    "data_size           : {5:>10} {5:>#12x}\n"
+    "bss_start           : {6:>10} {6:>#12x}\n"
+    "bss_size            : {7:>10} {7:>#12x}\n"
+    "reldata_start       : {8:>10} {8:>#12x}\n"
+    "  [reldata_len]     : {10:>10} {10:>#12x}\n"
+    "stack_size          : {9:>10} {9:>#12x}\n"
+)
+
 
 class TabTbf:
     """
@@ -41,6 +59,8 @@ class TabApp:
     App object, and the correct one for the board will be used later.
     """
 
+    __slots__ = ("tbfs", "_name", "_size", "_fixed_flash_addresses")
+
     def __init__(self, tbfs):
         """
         Create a `TabApp` from a list of TabTbfs.
@@ -52,17 +72,31 @@ class TabApp:
 
         self.tbfs = tbfs  # A list of TabTbfs.
 
+        # Cached results of `get_name()`, `get_size()`, and
+        # `_get_fixed_flash_addresses()`. Anything that changes the headers
+        # must reset these with `_clear_cache()`.
+        self._name = None
+        self._size = None
+        self._fixed_flash_addresses = None
+
     def get_name(self):
         """
         Return the app name.
         """
-        app_names = set([tbf.tbfh.get_app_name() for tbf in self.tbfs])
-        if len(app_names) > 1:
-            raise TockLoaderException("Different names inside the same TAB?")
-        elif len(app_names) == 0:
-            raise TockLoaderException("No name in the TBF binaries")
+        if self._name is None:
+            tbfs = self.tbfs
+            # `__init__` guarantees there is at least one TBF, and almost
+            # always there is exactly one.
+            name = tbfs[0].tbfh.get_app_name()
+            if len(tbfs) > 1:
+                for tbf in tbfs:
+                    if tbf.tbfh.get_app_name() != name:
+                        raise TockLoaderException(
+                            "Different names inside the same TAB?"
+                        )
+            self._name = name
 
-        return app_names.pop()
+        return self._name
 
     def is_modified(self):
         """
@@ -102,10 +136,13 @@ class TabApp:
 
         This is only valid if there is only one TBF.
         """
-        if len(self.tbfs) == 1:
-            return self.tbfs[0].tbfh.get_app_size()
-        else:
-            raise TockLoaderException("Size only valid with one TBF")
+        if self._size is None:
+            if len(self.tbfs) == 1:
+                self._size = self.tbfs[0].tbfh.get_app_size()
+            else:
+                raise TockLoaderException("Size only valid with one TBF")
+
+        return self._size
 
     def get_app_version(self):
         """
@@ -123,17 +160,20 @@ class TabApp:
         Force the entire app to be a certain size. If `size` is smaller than the
         actual app an error will be thrown.
         """
+        # Check every TBF before changing any of them so a failure does not
+        # leave the app partially resized.
         for tbf in self.tbfs:
-            header_size = tbf.tbfh.get_header_size()
-            binary_size = len(tbf.binary)
-            current_size = header_size + binary_size
+            current_size = tbf.tbfh.get_header_size() + len(tbf.binary)
             if size < current_size:
                 raise TockLoaderException(
                     "Cannot make app smaller. Current size: {} bytes".format(
                         current_size
                     )
                 )
+
+        for tbf in self.tbfs:
             tbf.tbfh.set_app_size(size)
+        self._clear_cache()
 
     def set_minimum_size(self, size):
         """
@@ -141,11 +181,10 @@ class TabApp:
         smaller than the actual app nothing happens.
         """
         for tbf in self.tbfs:
-            header_size = tbf.tbfh.get_header_size()
-            binary_size = len(tbf.binary)
-            current_size = header_size + binary_size
-            if size > current_size:
-                tbf.tbfh.set_app_size(size)
+            tbfh = tbf.tbfh
+            if size > tbfh.get_header_size() + len(tbf.binary):
+                tbfh.set_app_size(size)
+        self._clear_cache()
 
     def set_size_constraint(self, constraint):
         """
@@ -188,18 +227,19 @@ class TabApp:
                             )
                         )
 
+        self._clear_cache()
+
     def has_fixed_addresses(self):
         """
         Return true if any TBF binary in this app is compiled for a fixed
         address. That likely implies _all_ binaries are compiled for a fixed
         address.
         """
-        has_fixed_addresses = False
-        for tbf in self.tbfs:
-            if tbf.tbfh.has_fixed_addresses():
-                has_fixed_addresses = True
-                break
-        return has_fixed_addresses
+        tbfs = self.tbfs
+        if len(tbfs) == 1:
+            return tbfs[0].tbfh.has_fixed_addresses()
+
+        return any(tbf.tbfh.has_fixed_addresses() for tbf in tbfs)
 
     def get_fixed_addresses_flash_and_sizes(self):
         """
@@ -209,10 +249,10 @@ class TabApp:
         [(address, size), (address, size), ...]
         """
         apps_in_flash = []
-        for tbf in self.tbfs:
-            apps_in_flash.append(
-                (tbf.tbfh.get_fixed_addresses()[1], tbf.tbfh.get_app_size())
-            )
+        for tbf, (fixed_flash_address, _) in zip(
+            self.tbfs, self._get_fixed_flash_addresses()
+        ):
+            apps_in_flash.append((fixed_flash_address, tbf.tbfh.get_app_size()))
         return apps_in_flash
 
     def is_loadable_at_address(self, address):
@@ -225,10 +265,7 @@ class TabApp:
             return True
 
         # Otherwise, see if we have a TBF which can go at the requested address.
-        for tbf in self.tbfs:
-            fixed_flash_address = tbf.tbfh.get_fixed_addresses()[1]
-            tbf_header_length = tbf.tbfh.get_header_size()
-
+        for fixed_flash_address, tbf_header_length in self._get_fixed_flash_addresses():
             # Ok, we have to be a little tricky here. What we actually care
             # about is ensuring that the application binary itself ends up at
             # the requested fixed address. However, what this function has to do
@@ -279,22 +316,21 @@ class TabApp:
         # Find the binary with the lowest valid address that is above `address`.
         best_address = None
         best_index = None
-        for i, tbf in enumerate(self.tbfs):
-            fixed_flash_address = tbf.tbfh.get_fixed_addresses()[1]
-
+        for i, (fixed_flash_address, _) in enumerate(self._get_fixed_flash_addresses()):
             # Align to get a reasonable address for this app.
             wanted_address = align_down_to(fixed_flash_address, 1024)
 
             if wanted_address >= address:
-                if best_address == None:
+                if best_address is None:
                     best_address = wanted_address
                     best_index = i
                 elif wanted_address < best_address:
                     best_address = wanted_address
                     best_index = i
 
-        if best_index != None:
+        if best_index is not None:
             self.tbfs = [self.tbfs[best_index]]
+            self._clear_cache()
             return best_address
         else:
             return None
@@ -306,6 +342,7 @@ class TabApp:
         for tbf in self.tbfs:
             tbf.tbfh.delete_tlv(tlvid)
             tbf.tbff.delete_tlv(tlvid)
+        self._clear_cache()
 
     def modify_tbfh_tlv(self, tlvid, field, value):
         """
@@ -313,6 +350,7 @@ class TabApp:
         """
         for tbf in self.tbfs:
             tbf.tbfh.modify_tlv(tlvid, field, value)
+        self._clear_cache()
 
     def add_credential(self, credential_type, public_key, private_key, cleartext_id):
         """
@@ -366,17 +404,14 @@ class TabApp:
 
         if len(self.tbfs) == 1:
             tbfh = self.tbfs[0].tbfh
-            app_binary = self.tbfs[0].binary
-            tbff = self.tbfs[0].tbff
 
             # If the TBF is not compiled for a fixed address, then we can just
-            # use it.
-            if tbfh.has_fixed_addresses() == False:
-                binary = tbfh.get_binary() + app_binary + tbff.get_binary()
-
-            else:
+            # use it. Otherwise the header has to be adjusted so the app
+            # binary ends up at its fixed address.
+            if tbfh.has_fixed_addresses():
                 tbfh.adjust_starting_address(address)
-                binary = tbfh.get_binary() + app_binary + tbff.get_binary()
+
+            binary = self._get_tbf_binary(self.tbfs[0])
 
             # Check that the binary is not longer than it is supposed to be.
             # This might happen if the size was changed, but any code using this
@@ -389,7 +424,7 @@ class TabApp:
             return binary
 
         else:
-            raise ("Only valid for one TBF file.")
+            raise TockLoaderException("Only valid for one TBF file.")
 
     def get_names_and_binaries(self):
         """
@@ -398,7 +433,7 @@ class TabApp:
         """
         out = []
         for tbf in self.tbfs:
-            binary = tbf.tbfh.get_binary() + tbf.binary + tbf.tbff.get_binary()
+            binary = self._get_tbf_binary(tbf)
             # Truncate in case the header grew and elf2tab padded the binary.
             binary = self._truncate_binary(binary)
             out.append((tbf.filename, binary))
@@ -410,10 +445,9 @@ class TabApp:
         doing PIC fixups. We assume this header is positioned immediately
         after the TBF header (AKA at the beginning of the application binary).
         """
-        tbfh = self.tbfs[0].tbfh
         app_binary = self.tbfs[0].binary
 
-        crt0 = struct.unpack("<IIIIIIIIII", app_binary[0:40])
+        crt0 = _CRT0_STRUCT.unpack_from(app_binary)
 
         # Also display the number of relocations in the binary.
         reldata_start = crt0[8]
@@ -421,22 +455,7 @@ class TabApp:
             "<I", app_binary[reldata_start : reldata_start + 4]
         )[0]
 
-        out = ""
-        out += "{:<20}: {:>10} {:>#12x}\n".format("got_sym_start", crt0[0], crt0[0])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("got_start", crt0[1], crt0[1])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("got_size", crt0[2], crt0[2])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("data_sym_start", crt0[3], crt0[3])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("data_start", crt0[4], crt0[4])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("data_size", crt0[5], crt0[5])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("bss_start", crt0[6], crt0[6])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("bss_size", crt0[7], crt0[7])
-        out += "{:<20}: {:>10} {:>#12x}\n".format("reldata_start", crt0[8], crt0[8])
-        out += "  {:<18}: {:>10} {:>#12x}\n".format(
-            "[reldata_len]", reldata_len, reldata_len
-        )
-        out += "{:<20}: {:>10} {:>#12x}\n".format("stack_size", crt0[9], crt0[9])
-
-        return out
+        return _CRT0_TEMPLATE.format(*crt0, reldata_len)
 
     def info(self, verbose=False):
         """
@@ -452,6 +471,40 @@ class TabApp:
                 out += textwrap.indent(str(tbf.tbfh), "  ")
         return out
 
+    def _clear_cache(self):
+        """
+        Forget the cached name, size, and fixed flash addresses after the TBF
+        headers were modified.
+        """
+        self._name = None
+        self._size = None
+        self._fixed_flash_addresses = None
+
+    def _get_fixed_flash_addresses(self):
+        """
+        Return a list of (fixed_flash_address, header_size) tuples, one for
+        each TBF in the same order as `self.tbfs`.
+
+        Looking up the fixed addresses TLV requires searching the header, and
+        these values are needed every time we try to place the app, so they
+        are computed once and cached. Only valid if the TBFs have fixed
+        addresses.
+        """
+        if self._fixed_flash_addresses is None:
+            self._fixed_flash_addresses = [
+                (tbf.tbfh.get_fixed_addresses()[1], tbf.tbfh.get_header_size())
+                for tbf in self.tbfs
+            ]
+        return self._fixed_flash_addresses
+
+    def _get_tbf_binary(self, tbf):
+        """
+        Concatenate the TBF header, application binary, and TBF footer of
+        `tbf` into a single bytes object. This copies the application binary
+        only once.
+        """
+        return b"".join((tbf.tbfh.get_binary(), tbf.binary, tbf.tbff.get_binary()))
+
     def _truncate_binary(self, binary):
         """
         Optionally truncate binary if the header+protected size has grown, and
@@ -468,8 +521,7 @@ class TabApp:
 
             # Check on what we would be removing. If it is all zeros, we
             # determine that it is OK to truncate.
-            to_remove = binary[size:]
-            if len(to_remove) != to_remove.count(0):
+            if len(binary) - size != binary.count(0, size):
                 raise TockLoaderException("Error truncating binary. Not zero.")
 
             binary = binary[0:size]
@@ -4,7 +4,6 @@ Interface with a board over serial that is using the
 """
 
 import atexit
-import crcmod
 import datetime
 import hashlib
 import json
@@ -16,6 +15,7 @@ import struct
 import sys
 import time
 import threading
+import zlib
 
 # Although Windows is not supported actively, this allow features that "just
 # work" to work on Windows.
@@ -24,7 +24,6 @@ if platform.system() != "Windows":
 
 import serial
 import serial.tools.list_ports
-import serial.tools.miniterm
 
 from . import helpers
 from .board_interface import BoardInterface
@@ -32,6 +31,11 @@ from .exceptions import TockLoaderException
 
 from tqdm import tqdm  # Used for printing progress bars
 
+# Precompiled formats for the arguments of commands that are sent once per
+# page or per chunk when reading and writing flash.
+_PAGE_ADDRESS = struct.Struct("<I")
+_READ_RANGE = struct.Struct("<IH")
+
 
 class BootloaderSerial(BoardInterface):
     """
@@ -41,6 +45,11 @@ class BootloaderSerial(BoardInterface):
     # "This was chosen as it is infrequent in .bin files" - immesys
     ESCAPE_CHAR = 0xFC
 
+    # The escape character by itself and escaped, as used when escaping and
+    # de-escaping messages.
+    ESCAPE_BYTES = bytes([ESCAPE_CHAR])
+    ESCAPED_ESCAPE_BYTES = bytes([ESCAPE_CHAR, ESCAPE_CHAR])
+
     # Commands from this tool to the bootloader.
     # The "X" commands are for external flash.
     COMMAND_PING = 0x01
@@ -104,6 +113,13 @@ class BootloaderSerial(BoardInterface):
         # local data structure to hold them.
         self.attributes = ["uncached"] * 16
 
+        # We also cache ranges of flash we have read, since walking the list of
+        # apps often reads the same regions several times. This is a list of
+        # (address, bytes) tuples, and it is cleared whenever we write to the
+        # board or enter or exit the bootloader, since the board may change
+        # flash while it is not in the bootloader.
+        self.flash_cache = []
+
     def _determine_port(self, any=False):
         """
         Helper function to determine which serial port on the host to use to
@@ -646,6 +662,9 @@ class BootloaderSerial(BoardInterface):
         Reset the chip and assert the bootloader select pin to enter bootloader
         mode. Handle retries if necessary.
         """
+        # Flash may have changed since the last time we were in the bootloader.
+        self.flash_cache = []
+
         # Try baud rate trick first.
         entered_bootloader = self._toggle_bootloader_entry_baud_rate()
         if not entered_bootloader:
@@ -703,6 +722,9 @@ class BootloaderSerial(BoardInterface):
         """
         Reset the chip to exit bootloader mode.
         """
+        # Once the board is running again it may write to its flash.
+        self.flash_cache = []
+
         if self.args.jtag:
             return
 
@@ -736,30 +758,51 @@ class BootloaderSerial(BoardInterface):
         """
         Throws an exception if the device does not respond with a PONG.
         """
-        for i in range(30):
-            # Try to ping the SAM4L to ensure it is in bootloader mode
-            ping_pkt = bytes([self.ESCAPE_CHAR, self.COMMAND_PING])
-            self.sp.write(ping_pkt)
-
-            # Read much more than we need in case something got in the
-            # serial channel that we need to clear.
-            ret = self.sp.read(200)
-
-            if len(ret) == 2 and ret[1] == self.RESPONSE_PONG:
+        ping_pkt = bytes([self.ESCAPE_CHAR, self.COMMAND_PING])
+        pong = bytes([self.ESCAPE_CHAR, self.RESPONSE_PONG])
+
+        # Send a single ping and then keep listening for the pong. Re-sending
+        # pings while the bootloader is answering only fills its receive
+        # buffer, so we only ping again if the line has been completely quiet
+        # for a full read timeout (e.g. the bootloader was not yet running when
+        # the first ping was sent). The overall budget matches the previous 30
+        # ping attempts.
+        deadline = time.monotonic() + 30 * self.sp.timeout
+        pings_sent = 0
+        last = b""
+        while time.monotonic() < deadline:
+            if last == b"":
+                # Try to ping the SAM4L to ensure it is in bootloader mode
+                self.sp.write(ping_pkt)
+                pings_sent += 1
+
+            # Something else may have gotten into the serial channel before the
+            # pong, so we look for the pong anywhere in what we receive. This
+            # returns as soon as the pong arrives, rather than waiting for the
+            # read to time out. Keep the previous byte in case the pong was
+            # split across two reads.
+            ret = self.sp.read_until(pong, 200)
+            if pong in last[-1:] + ret:
+                # If we had to send more than one ping, the bootloader may still
+                # be answering the earlier ones. Clear those responses so they
+                # are not mistaken for the response to the next command.
+                if pings_sent > 1:
+                    timeout = self.sp.timeout
+                    self.sp.timeout = 0.05
+                    try:
+                        self.sp.read(200)
+                    finally:
+                        self.sp.timeout = timeout
                 return
+            last = ret
         raise TockLoaderException("No PONG received")
 
-    def _issue_command(
-        self, command, message, sync, response_len, response_code, show_errors=True
-    ):
+    def _build_command(self, command, message, sync):
         """
-        Setup a command to send to the bootloader and handle the response.
+        Create the escaped packet for a command to send to the bootloader.
         """
-
         # Generate the message to send to the bootloader
-        escaped_message = message.replace(
-            bytes([self.ESCAPE_CHAR]), bytes([self.ESCAPE_CHAR, self.ESCAPE_CHAR])
-        )
+        escaped_message = message.replace(self.ESCAPE_BYTES, self.ESCAPED_ESCAPE_BYTES)
         pkt = escaped_message + bytes([self.ESCAPE_CHAR, command])
 
         # If there should be a sync/reset message, prepend the outgoing message
@@ -767,9 +810,23 @@ class BootloaderSerial(BoardInterface):
         if sync:
             pkt = self.SYNC_MESSAGE + pkt
 
+        return pkt
+
+    def _issue_command(
+        self, command, message, sync, response_len, response_code, show_errors=True
+    ):
+        """
+        Setup a command to send to the bootloader and handle the response.
+        """
         # Write the command message.
-        self.sp.write(pkt)
+        self.sp.write(self._build_command(command, message, sync))
+
+        return self._read_response(response_len, response_code, show_errors)
 
+    def _read_response(self, response_len, response_code, show_errors=True):
+        """
+        Read and check the response to a command sent to the bootloader.
+        """
         # Response has a two byte header, then response_len bytes. Keeping in
         # mind that bytes can be escaped, keep track of how how many bytes we
         # need to read in.
@@ -819,9 +876,7 @@ class BootloaderSerial(BoardInterface):
                 new_data += self.sp.read(1)
 
             # De-escape, and add to array of read in bytes.
-            ret += new_data.replace(
-                bytes([self.ESCAPE_CHAR, self.ESCAPE_CHAR]), bytes([self.ESCAPE_CHAR])
-            )
+            ret += new_data.replace(self.ESCAPED_ESCAPE_BYTES, self.ESCAPE_BYTES)
 
         if len(ret) != 2 + response_len:
             if show_errors:
@@ -867,6 +922,18 @@ class BootloaderSerial(BoardInterface):
             if not success:
                 # Something went wrong. Go back to old baud rate
                 self.sp.baudrate = 115200
+                logging.info(
+                    "Could not switch to {} baud, staying at 115200 baud.".format(
+                        baud_rate
+                    )
+                )
+            else:
+                logging.info("Switched bootloader to {} baud.".format(baud_rate))
+
+        else:
+            logging.info(
+                "Bootloader does not support changing the baud rate, staying at 115200 baud."
+            )
 
     def _exit_bootloader(self):
         """
@@ -886,7 +953,7 @@ class BootloaderSerial(BoardInterface):
         if len(binary) % self.page_size != 0:
             remaining = self.page_size - (len(binary) % self.page_size)
             if pad:
-                binary += bytes([0xFF] * remaining)
+                binary += bytes([0xFF]) * remaining
                 logging.info("Padding binary with {} 0xFFs.".format(remaining))
             else:
                 # Don't pad, actually use the bytes already on the chip
@@ -896,20 +963,45 @@ class BootloaderSerial(BoardInterface):
                     "Padding binary with {} bytes already on chip.".format(remaining)
                 )
 
-        # Loop through the binary by pages at a time until it has been flashed
-        # to the chip.
-        for i in tqdm(range(len(binary) // self.page_size)):
-            # Create the packet that we send to the bootloader. First four
-            # bytes are the address of the page.
-            pkt = struct.pack("<I", address + (i * self.page_size))
+        # Anything we have read from flash is about to be out of date.
+        self.flash_cache = []
 
-            # Next are the bytes that go into the page.
-            pkt += binary[i * self.page_size : (i + 1) * self.page_size]
+        # Create the escaped write page commands for every page before we start
+        # talking to the bootloader, so that the loop below only has to send
+        # them and check the responses.
+        #
+        # The message for each page is the four byte address of the page,
+        # followed by the bytes that go into the page. We reuse the same
+        # buffer for every page, and copy each page into it directly from the
+        # binary without creating an intermediate slice.
+        message = bytearray(_PAGE_ADDRESS.size + self.page_size)
+        pkts = []
+        with memoryview(binary) as binary_view:
+            for i in range(len(binary) // self.page_size):
+                _PAGE_ADDRESS.pack_into(message, 0, address + (i * self.page_size))
+                message[_PAGE_ADDRESS.size :] = binary_view[
+                    i * self.page_size : (i + 1) * self.page_size
+                ]
+                pkts.append(self._build_command(self.COMMAND_WRITE_PAGE, message, True))
 
+        # Loop through the binary by pages at a time until it has been flashed
+        # to the chip.
+        #
+        # Normally we wait for the bootloader to acknowledge each page before
+        # sending the next one. If the user allows it, we keep several pages
+        # in flight so the bootloader can receive the next page while it is
+        # still writing the current one to flash. This requires a bootloader
+        # with a large enough receive buffer.
+        pipeline_depth = max(1, self.args.pipeline_depth)
+        next_pkt = 0
+        for i in tqdm(range(len(pkts))):
             # Write to bootloader
-            success, ret = self._issue_command(
-                self.COMMAND_WRITE_PAGE, pkt, True, 0, self.RESPONSE_OK
-            )
+            while next_pkt < len(pkts) and next_pkt < i + pipeline_depth:
+                self.sp.write(pkts[next_pkt])
+                next_pkt += 1
+
+            # Check the response for page `i`.
+            success, ret = self._read_response(0, self.RESPONSE_OK)
 
             if not success:
                 logging.error("Error when flashing page")
@@ -941,6 +1033,21 @@ class BootloaderSerial(BoardInterface):
         self._check_crc(address, binary)
 
     def read_range(self, address, length):
+        # Check if we have already read this range.
+        for cached_address, cached in self.flash_cache:
+            offset = address - cached_address
+            if offset >= 0 and offset + length <= len(cached):
+                return cached[offset : offset + length]
+
+        read = self._read_range(address, length)
+        if len(read) == length:
+            self.flash_cache.append((address, read))
+        return read
+
+    def _read_range(self, address, length):
+        """
+        Read a range of flash from the board without using the cache.
+        """
         # Can only read up to 4095 bytes at a time.
         MAX_READ = 4095
         read = bytes()
@@ -954,7 +1061,7 @@ class BootloaderSerial(BoardInterface):
                 this_length = remaining
                 remaining = 0
 
-            message = struct.pack("<IH", address, this_length)
+            message = _READ_RANGE.pack(address, this_length)
             success, flash = self._issue_command(
                 self.COMMAND_READ_RANGE,
                 message,
@@ -982,11 +1089,13 @@ class BootloaderSerial(BoardInterface):
 
         else:
             # Otherwise, we write a few 0xFF as an entire page.
-            binary = bytes([0xFF] * 8)
+            binary = bytes([0xFF]) * 8
             address, binary = self.__align_and_stretch_to_page(binary, address)
             self.flash_binary(address, binary)
 
     def erase_page(self, address):
+        self.flash_cache = []
+
         message = struct.pack("<I", address)
         success, ret = self._issue_command(
             self.COMMAND_ERASE_PAGE, message, True, 0, self.RESPONSE_OK
@@ -1009,6 +1118,8 @@ class BootloaderSerial(BoardInterface):
                 raise TockLoaderException("Error: 0x{:X}".format(ret[1]))
 
     def set_start_address(self, address):
+        self.flash_cache = []
+
         message = struct.pack("<I", address)
         success, ret = self._issue_command(
             self.COMMAND_SET_START_ADDRESS, message, True, 0, self.RESPONSE_OK
@@ -1035,8 +1146,15 @@ class BootloaderSerial(BoardInterface):
 
         # There is a bug in a version of the bootloader where the CRC returns 6
         # bytes and not just 4. Need to read just in case to grab those extra
-        # bytes.
-        self.sp.read(2)
+        # bytes. Bootloaders without the bug send nothing more, so only wait
+        # briefly rather than the full serial timeout. The extra bytes are sent
+        # right after the CRC, so they arrive well within this time.
+        timeout = self.sp.timeout
+        self.sp.timeout = 0.05
+        try:
+            self.sp.read(2)
+        finally:
+            self.sp.timeout = timeout
 
         if not success:
             if crc[1] == self.RESPONSE_BADADDR:
@@ -1065,9 +1183,9 @@ class BootloaderSerial(BoardInterface):
         # Now interpret the returned bytes as the CRC
         crc_bootloader = struct.unpack("<I", crc_data[0:4])[0]
 
-        # Calculate the CRC locally
-        crc_function = crcmod.mkCrcFun(0x104C11DB7, initCrc=0, xorOut=0xFFFFFFFF)
-        crc_loader = crc_function(binary, 0)
+        # Calculate the CRC locally. The bootloader uses the standard reflected
+        # CRC-32 (polynomial 0x04C11DB7), which is exactly what zlib computes.
+        crc_loader = zlib.crc32(binary) & 0xFFFFFFFF
 
         if crc_bootloader != crc_loader:
             raise TockLoaderException(
@@ -1114,6 +1232,7 @@ class BootloaderSerial(BoardInterface):
     def set_attribute(self, index, raw):
         # Clear cached entry just in case.
         self.attributes[index] = "uncached"
+        self.flash_cache = []
 
         message = struct.pack("<B", index) + raw
         success, ret = self._issue_command(
@@ -1208,6 +1327,9 @@ class BootloaderSerial(BoardInterface):
         """
         Run miniterm for receiving data from the board.
         """
+        # Only needed here, so avoid paying for the import on every command.
+        import serial.tools.miniterm
+
         logging.info("Listening for serial output.")
 
         # Create a custom filter for miniterm that prepends the date.
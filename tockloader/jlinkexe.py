@@ -373,7 +373,7 @@ class JLinkExe(BoardInterface):
         logging.debug("Clearing 512 bytes starting at address {:#0x}".format(address))
 
         # Write 512 bytes of 0xFF as that seems to work.
-        binary = bytes([0xFF] * 512)
+        binary = bytes([0xFF]) * 512
         commands = [
             "h\nr",
             "loadbin {{binary}}, {address:#x}".format(address=address),
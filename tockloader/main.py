@@ -12,7 +12,6 @@ import argparse
 import atexit
 import binascii
 import functools
-import glob
 import logging
 import os
 import subprocess
@@ -22,7 +21,6 @@ import time
 import urllib.parse
 
 import argcomplete
-import crcmod
 
 from . import helpers
 from .exceptions import TockLoaderException
@@ -46,6 +44,45 @@ def check_and_run_make(args):
                 sys.exit(1)
 
 
+# Directories that never contain TABs worth loading but can be very large.
+_TAB_SEARCH_SKIP_DIRS = {"node_modules", "__pycache__"}
+
+
+def _is_symlink_loop(dirpath, dirname):
+    """
+    Check if `dirname` in `dirpath` is a symlink back to the folder itself or to
+    one of its parents, which would make a recursive walk never end.
+    """
+    path = os.path.join(dirpath, dirname)
+    if not os.path.islink(path):
+        return False
+    target = os.path.realpath(path)
+    parent = os.path.realpath(dirpath)
+    return parent == target or parent.startswith(target + os.sep)
+
+
+def find_tabs(root):
+    """
+    Recursively find all ".tab" files under `root`. Like a recursive glob this
+    ignores hidden files and folders and follows symlinked folders, but it also
+    does not descend into folders (like `node_modules`) that can be expensive to
+    walk.
+    """
+    tab_names = []
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames[:] = [
+            d
+            for d in dirnames
+            if not d.startswith(".")
+            and d not in _TAB_SEARCH_SKIP_DIRS
+            and not _is_symlink_loop(dirpath, d)
+        ]
+        for filename in filenames:
+            if filename.endswith(".tab") and not filename.startswith("."):
+                tab_names.append(os.path.join(dirpath, filename))
+    return tab_names
+
+
 def collect_tabs(args):
     """
     Load in Tock Application Bundle (TAB) files. If none are specified, this
@@ -75,7 +112,7 @@ def collect_tabs(args):
                 )
 
         # Search for ".tab" files
-        tab_names = glob.glob("./**/*.tab", recursive=True)
+        tab_names = find_tabs(".")
         if len(tab_names) == 0:
             raise TockLoaderException("No TAB files found.")
 
@@ -656,7 +693,13 @@ def main():
         "--baud-rate",
         default=115200,
         type=int,
-        help="If using serial, set the target baud rate.",
+        help="If using serial, set the target baud rate. Higher rates make flashing faster, and Tockloader falls back to 115200 if the bootloader does not support the requested rate.",
+    )
+    parent_channel.add_argument(
+        "--pipeline-depth",
+        default=1,
+        type=int,
+        help="If using serial, the number of flash pages to send before waiting for the bootloader to acknowledge them. Values above 1 are faster but require a bootloader that can buffer the extra pages.",
     )
     parent_channel.add_argument(
         "--no-bootloader-entry",
@@ -343,7 +343,7 @@ You may need to update OpenOCD to the version in latest git master."
     def clear_bytes(self, address):
         logging.debug("Clearing bytes starting at {:#0x}".format(address))
 
-        binary = bytes([0xFF] * 8)
+        binary = bytes([0xFF]) * 8
         self.flash_binary(address, binary)
 
     def determine_current_board(self):
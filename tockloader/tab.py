@@ -3,10 +3,8 @@ import io
 import logging
 import os
 import shutil
-import struct
 import tarfile
 import tempfile
-import textwrap
 import urllib.request
 
 import toml
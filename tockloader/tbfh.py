@@ -11,6 +11,43 @@ from Crypto.Hash import SHA512
 
 from .exceptions import TockLoaderException
 
+# Precompiled layouts of the fixed parts of a TBF header. These are unpacked
+# for every header read from a board or TAB.
+_TBF_HEADER_V1_BASE = struct.Struct("<18I")
+_TBF_HEADER_V2_BASE = struct.Struct("<HIII")
+
+# Names of the base fields in the order they appear in the header.
+_TBF_HEADER_V1_FIELDS = (
+    "total_size",
+    "entry_offset",
+    "rel_data_offset",
+    "rel_data_size",
+    "text_offset",
+    "text_size",
+    "got_offset",
+    "got_size",
+    "data_offset",
+    "data_size",
+    "bss_mem_offset",
+    "bss_mem_size",
+    "min_stack_len",
+    "min_app_heap_len",
+    "min_kernel_heap_len",
+    "package_name_offset",
+    "package_name_size",
+    "checksum",
+)
+_TBF_HEADER_V2_FIELDS = ("header_size", "total_size", "flags", "checksum")
+_TBF_TLV_HEADER = struct.Struct("<HH")
+_TBF_HEADER_V2_TEMPLATE = (
+    "header_size           : {header_size:>10} {header_size:>#12x}\n"
+    "total_size            : {total_size:>10} {total_size:>#12x}\n"
+    "checksum              :            {checksum:>#12x}\n"
+    "flags                 : {flags:>10} {flags:>#12x}\n"
+    "  enabled             : {enabled}\n"
+    "  sticky              : {sticky}\n"
+)
+
 
 def roundup(x, to):
     return x if x % to == 0 else x + to - x % to
@@ -597,38 +634,18 @@ class TBFHeader:
         if self.version == 1 and len(buffer) >= 74:
             checksum = self._checksum(full_buffer[0:72])
             buffer = buffer[2:]
-            base = struct.unpack("<IIIIIIIIIIIIIIIIII", buffer[0:72])
+            base = _TBF_HEADER_V1_BASE.unpack_from(buffer)
             buffer = buffer[72:]
-            self.fields["total_size"] = base[0]
-            self.fields["entry_offset"] = base[1]
-            self.fields["rel_data_offset"] = base[2]
-            self.fields["rel_data_size"] = base[3]
-            self.fields["text_offset"] = base[4]
-            self.fields["text_size"] = base[5]
-            self.fields["got_offset"] = base[6]
-            self.fields["got_size"] = base[7]
-            self.fields["data_offset"] = base[8]
-            self.fields["data_size"] = base[9]
-            self.fields["bss_mem_offset"] = base[10]
-            self.fields["bss_mem_size"] = base[11]
-            self.fields["min_stack_len"] = base[12]
-            self.fields["min_app_heap_len"] = base[13]
-            self.fields["min_kernel_heap_len"] = base[14]
-            self.fields["package_name_offset"] = base[15]
-            self.fields["package_name_size"] = base[16]
-            self.fields["checksum"] = base[17]
+            self.fields.update(zip(_TBF_HEADER_V1_FIELDS, base))
             self.app = True
 
             if checksum == self.fields["checksum"]:
                 self.valid = True
 
         elif self.version == 2 and len(buffer) >= 14:
-            base = struct.unpack("<HIII", buffer[0:14])
+            base = _TBF_HEADER_V2_BASE.unpack_from(buffer)
             buffer = buffer[14:]
-            self.fields["header_size"] = base[0]
-            self.fields["total_size"] = base[1]
-            self.fields["flags"] = base[2]
-            self.fields["checksum"] = base[3]
+            self.fields.update(zip(_TBF_HEADER_V2_FIELDS, base))
 
             if (
                 len(full_buffer) >= self.fields["header_size"]
@@ -648,7 +665,7 @@ class TBFHeader:
                     self.app = True
 
                     while remaining >= 4:
-                        base = struct.unpack("<HH", buffer[0:4])
+                        base = _TBF_TLV_HEADER.unpack_from(buffer)
                         buffer = buffer[4:]
                         tipe = base[0]
                         length = base[1]
@@ -1115,7 +1132,7 @@ class TBFHeader:
         padding = len(buffer) % 4
         if padding != 0:
             padding = 4 - padding
-            buffer += bytes([0] * padding)
+            buffer += bytes(padding)
 
         # Loop throw
         checksum = 0
@@ -1170,23 +1187,10 @@ class TBFHeader:
             return out
 
         # Base fields that always exist.
-        out += "{:<22}: {:>10} {:>#12x}\n".format(
-            "header_size", self.fields["header_size"], self.fields["header_size"]
-        )
-        out += "{:<22}: {:>10} {:>#12x}\n".format(
-            "total_size", self.fields["total_size"], self.fields["total_size"]
-        )
-        out += "{:<22}:            {:>#12x}\n".format(
-            "checksum", self.fields["checksum"]
-        )
-        out += "{:<22}: {:>10} {:>#12x}\n".format(
-            "flags", self.fields["flags"], self.fields["flags"]
-        )
-        out += "  {:<20}: {}\n".format(
-            "enabled", ["No", "Yes"][(self.fields["flags"] >> 0) & 0x01]
-        )
-        out += "  {:<20}: {}\n".format(
-            "sticky", ["No", "Yes"][(self.fields["flags"] >> 1) & 0x01]
+        out += _TBF_HEADER_V2_TEMPLATE.format(
+            enabled=["No", "Yes"][(self.fields["flags"] >> 0) & 0x01],
+            sticky=["No", "Yes"][(self.fields["flags"] >> 1) & 0x01],
+            **self.fields
         )
 
         # Base header takes 16 bytes.
@@ -121,6 +121,10 @@ class TockLoader:
         # what board we are talking to.
         self.app_settings = self.TOCKLOADER_APP_SETTINGS["default"]
 
+        # Set while a connection to the board is active so that nested
+        # operations reuse it rather than re-entering the bootloader.
+        self.communicating_with_board = False
+
         # If the user specified a board manually, we might be able to update
         # options now, so we can try.
         self._update_board_specific_options()
@@ -207,6 +211,21 @@ class TockLoader:
         # And make sure the channel is open (e.g. open a serial port).
         self.channel.open_link_to_board()
 
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Keep the connection to the board (e.g. the bootloader) active across
+        several operations. Entering the bootloader resets the board, so when
+        running multiple commands this avoids doing that for each one:
+
+            tock_loader.open()
+            with tock_loader.session():
+                tock_loader.install(tabs)
+                tock_loader.list_apps(False, False, None)
+        """
+        with self._start_communication_with_board():
+            yield self
+
     def flash_binary(self, binary, address, pad=None):
         """
         Tell the bootloader to save the binary blob to an address in internal
@@ -595,7 +614,7 @@ class TockLoader:
                 )
 
             # Create a null buffer to overwrite with
-            out = bytes([0] * 9)
+            out = bytes(9)
 
             # Find if this attribute key already exists
             for index, attribute in enumerate(self.channel.get_all_attributes()):
@@ -726,7 +745,14 @@ class TockLoader:
 
         For the bootloader, the board needs to be reset and told to enter the
         bootloader mode. For JTAG, this is unnecessary.
+
+        If communication is already set up (e.g. inside `session()`), this
+        reuses it.
         """
+        if self.communicating_with_board:
+            yield
+            return
+
         # Time the operation
         then = time.time()
         try:
@@ -746,6 +772,7 @@ class TockLoader:
             logging.debug("start: Update board specific options")
             self._update_board_specific_options()
 
+            self.communicating_with_board = True
             yield
 
             if platform.system() == "Windows":
@@ -757,6 +784,7 @@ class TockLoader:
         except Exception as e:
             raise (e)
         finally:
+            self.communicating_with_board = False
             self.channel.exit_bootloader_mode()
 
     def _bootloader_is_present(self):
@@ -898,7 +926,7 @@ class TockLoader:
         out = bytes([])
         # Add key
         out += key.encode("utf-8")
-        out += bytes([0] * (8 - len(out)))
+        out += bytes(8 - len(out))
         # Add length
         out += bytes([len(value.encode("utf-8"))])
         # Add value
@@ -1263,6 +1291,12 @@ class TockLoader:
             if len(flash) < header_length:
                 break
 
+            # The list of apps ends at erased (or zeroed) flash. Check the
+            # version field for that directly rather than parsing a header we
+            # know is invalid.
+            if int.from_bytes(flash[0:2], "little") in (0x0000, 0xFFFF):
+                break
+
             # Get all the fields from the header
             tbfh = TBFHeader(flash)
 
@@ -1272,25 +1306,38 @@ class TockLoader:
                     # and include it.
                     tbff = None
                     app_binary = None
+                    footer_length = 0
                     if tbfh.has_footer():
-                        footer_start = address + tbfh.get_binary_end_offset()
                         footer_length = tbfh.get_footer_size()
-                        logging.debug(
-                            "Reading for app footer @{:#x}, {} bytes".format(
-                                footer_start, footer_length
-                            )
-                        )
-                        flash = self.channel.read_range(footer_start, footer_length)
-                        tbff = TBFFooter(tbfh, None, flash)
 
                     if extract_app_binary:
+                        # The footer directly follows the app binary in flash,
+                        # so we read both with one request.
                         app_binary_start = address + tbfh.get_header_size()
                         app_binary_len = (
                             tbfh.get_binary_end_offset() - tbfh.get_header_size()
                         )
-                        app_binary = self.channel.read_range(
-                            app_binary_start, app_binary_len
+                        logging.debug(
+                            "Reading for app binary and footer @{:#x}, {} bytes".format(
+                                app_binary_start, app_binary_len + footer_length
+                            )
                         )
+                        flash = self.channel.read_range(
+                            app_binary_start, app_binary_len + footer_length
+                        )
+                        app_binary = flash[:app_binary_len]
+                        if tbfh.has_footer():
+                            tbff = TBFFooter(tbfh, None, flash[app_binary_len:])
+
+                    elif tbfh.has_footer():
+                        footer_start = address + tbfh.get_binary_end_offset()
+                        logging.debug(
+                            "Reading for app footer @{:#x}, {} bytes".format(
+                                footer_start, footer_length
+                            )
+                        )
+                        flash = self.channel.read_range(footer_start, footer_length)
+                        tbff = TBFFooter(tbfh, None, flash)
 
                     app = InstalledApp(tbfh, tbff, address, app_binary)
                     apps.append(app)
@@ -1417,22 +1464,22 @@ class TockLoader:
         if not quiet:
             # Print info about each app
             for i, app in enumerate(apps):
+                # Assemble the whole block for each app so it is printed at once.
                 if app.is_app():
-                    print(helpers.text_in_box("App {}".format(i), 52))
+                    lines = [helpers.text_in_box("App {}".format(i), 52)]
 
                     # Check if this app is OK with the MPU region requirements.
                     if not self._app_is_aligned_correctly(
                         app.get_address(), app.get_size()
                     ):
-                        print("  [WARNING] App is misaligned for the MPU")
-
-                    print(textwrap.indent(app.info(verbose), "  "))
-                    print("")
+                        lines.append("  [WARNING] App is misaligned for the MPU")
                 else:
                     # Display padding
-                    print(helpers.text_in_box("Padding", 52))
-                    print(textwrap.indent(app.info(verbose), "  "))
-                    print("")
+                    lines = [helpers.text_in_box("Padding", 52)]
+
+                lines.append(textwrap.indent(app.info(verbose), "  "))
+                lines.append("")
+                print("\n".join(lines))
 
             if len(apps) == 0:
                 logging.info("No found apps.")